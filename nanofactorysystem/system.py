@@ -10,6 +10,7 @@
 ##########################################################################
 
 import math
+import numpy as np
 from scidatacontainer import Container
 
 from . import ImageContainer
@@ -30,6 +31,8 @@ class System(Parameter):
         "delay": 10.0,
         }
 
+    _axes_keys = ("x", "y", "z", "a", "b")
+
     def __init__(self, user, objective, logger=None, **kwargs):
 
         """ Initialize the scanner algorithm. """
@@ -86,6 +89,16 @@ class System(Parameter):
         self.log.info("Initialized system.")
 
 
+    def __setitem__(self, key, value):
+
+        """ Set parameter and keep the speed attribute used by the
+        hardware command methods up to date. """
+
+        super().__setitem__(key, value)
+        if key == "speed":
+            self._speed = value
+
+
     def close(self, home=True):
 
         """ Close connection to hardware devices. """
@@ -137,10 +150,21 @@ class System(Parameter):
         centre. """
 
         if vs is None:
-            vs = self.system.controller.position("XYZ")
+            vs = self.controller.position("XYZ")
         return self.transform.object_pos(v_px, vs)
 
 
+    def object_pos_batch(self, v_px, vs=None):
+
+        """ Return an array of object coordinates from the given sequence
+        of camera image coordinates based on the given or current stage
+        coordinates. """
+
+        if vs is None:
+            vs = self.controller.position("XYZ")
+        return self.transform.object_pos_batch(v_px, vs)
+
+
     def camera_pos(self, v_um, vs=None):
 
         """ Return camera image coordinates from given object coordinates
@@ -150,10 +174,21 @@ class System(Parameter):
         centre. """
 
         if vs is None:
-            vs = self.system.controller.position("XY")
+            vs = self.controller.position("XY")
         return self.transform.camera_pos(v_um, vs)
 
 
+    def camera_pos_batch(self, v_um, vs=None):
+
+        """ Return an array of camera image coordinates from the given
+        sequence of object coordinates based on the given or current stage
+        coordinates. """
+
+        if vs is None:
+            vs = self.controller.position("XY")
+        return self.transform.camera_pos_batch(v_um, vs)
+
+
     def stage_pos(self, v_um, v_px):
 
         """ Return stage coordinates required to match the given object
@@ -169,8 +204,8 @@ class System(Parameter):
 
         """ Move stages to their home position. """
 
-        self.controller.moveabs(self["speed"], a=0.0, b=0.0)
-        self.controller.moveabs(self["speed"], x=self.x0, y=self.y0, z=self.z0)
+        self.controller.moveabs(self._speed, a=0.0, b=0.0)
+        self.controller.moveabs(self._speed, x=self.x0, y=self.y0, z=self.z0)
         if wait:
             self.controller.wait("XYZ")
         self.log.debug(f"Moved to home position {self.x0:.0f}, {self.y0:.0f}, {self.z0:.0f}")
@@ -190,7 +225,7 @@ class System(Parameter):
         """ Return a dictionary containing the current position of all axes
         in micrometres. """
 
-        return dict(zip("xyzab", self.position("XYZAB")))
+        return dict(zip(self._axes_keys, self.controller.position("XYZAB")))
 
 
     def wait(self, axes, pause=None):
@@ -209,7 +244,7 @@ class System(Parameter):
         wait to be settled after the movement. """
 
         if speed is None:
-            speed = self["speed"]
+            speed = self._speed
         self.controller.moveabs(speed, **axes)
         if wait is not None:
             wait_axes = "".join(axes.keys())
@@ -245,25 +280,25 @@ class System(Parameter):
         exposure speed at the current position. The given approximate
         focus diameter is used to handle very short polylines. """
 
-        x = [x for x, y in line]
-        y = [y for x, y in line]
-        llx = min(x)
-        lly = min(y)
-        urx = max(x)
-        ury = max(y)
-        size = math.sqrt((urx-llx)**2 + (ury-lly)**2)
+        xs, ys = zip(*line)
+        llx = min(xs)
+        lly = min(ys)
+        urx = max(xs)
+        ury = max(ys)
+        size = math.hypot(urx-llx, ury-lly)
 
         if size < 0.2*dia:
             x = 0.5*(llx+urx)
             y = 0.5*(lly+ury)
-            self.controller.moveabs(self["speed"], x=x, y=y)
+            self.controller.moveabs(self._speed, x=x, y=y)
             self.pulse(power, 10*dia/speed)
         else:
+            move = self.controller.moveabs
             x, y = line[0]
-            self.controller.moveabs(self["speed"], x=x, y=y)
+            move(self._speed, x=x, y=y)
             self.controller.laseron(power)
             for x, y in line[1:]:
-                self.controller.moveabs(speed, x=x, y=y)
+                move(speed, x=x, y=y)
             self.controller.laseroff()
 
 
@@ -273,8 +308,12 @@ class System(Parameter):
         exposure speed at the given z position. The given approximate
         focus diameter is used to handle very short polylines. """
 
-        self.controller.moveabs(self["speed"], z=z)
+        self.controller.moveabs(self._speed, z=z)
+
+        # Skip empty lines, which polyline() can not handle
         for line in lines:
+            if len(line) == 0:
+                continue
             self.polyline(line, power, speed, dia)
 
 
@@ -282,20 +321,29 @@ class System(Parameter):
 
         """ Exposed the given 1 bit image as an array of laser pulses
         with given lateral pitch, laser power and pulse duration at the
-        given z position. """
+        given z position. The image must be rectangular, i.e. all rows
+        must have the same length. """
+
+        move = self.controller.moveabs
+        pulse = self.pulse
+        speed_fast = self._speed
 
-        self.controller.moveabs(self["speed"], z=z)
+        move(speed_fast, z=z)
         x0, y0 = self.position("xy")
-        h = len(img)
-        for j, row in enumerate(img):
-            y = y0 + (j-0.5*(h-1))*pitch
-            w = len(row)
-            for i, value in enumerate(row):
-                x = x0 + (i-0.5*(w-1))*pitch
-                if value > 0:
-                    self.controller.moveabs(self["speed"], x=x, y=y)
-                    self.pulse(power, dt)
-        self.controller.moveabs(self["speed"], x=x0, y=y0)
+
+        # Coordinates of all exposed pixels in row-major order
+        img = np.atleast_2d(img)
+        h, w = img.shape
+        xoff = x0 - 0.5*(w-1)*pitch
+        yoff = y0 - 0.5*(h-1)*pitch
+        j, i = np.nonzero(img > 0)
+        xs = xoff + i*pitch
+        ys = yoff + j*pitch
+
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            move(speed_fast, x=x, y=y)
+            pulse(power, dt)
+        move(speed_fast, x=x0, y=y0)
 
 
     def zline(self, power, fast, slow, dz):
@@ -338,7 +386,8 @@ class System(Parameter):
         items = {
             "content.json": content,
             "meta.json": meta,
-            } | self.items()
+            **self.items(),
+            }
 
         # Return container object
         config = config or self.config
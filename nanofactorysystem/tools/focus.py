@@ -427,7 +427,8 @@ class Focus(Parameter):
             }
 
         # Container dictionary
-        items = self.system.items() | {
+        items = self.system.items()
+        items.update({
             "content.json": content,
             "meta.json": meta,
             "references.json": refs,
@@ -438,7 +439,7 @@ class Focus(Parameter):
             "data/focus.json": self.parameters(),
             "meas/image_diff.png": self.diff,
             "meas/result.json": self.result,
-            }
+            })
 
         # Return container object
         config = config or self.config
@@ -728,14 +728,15 @@ class Layer(Parameter):
             }
 
         # Container dictionary
-        items = self.system.items() | {
+        items = self.system.items()
+        items.update({
             "content.json": content,
             "meta.json": meta,
             "references.json": refs,
             "data/layer.json": self.parameters(),
             "meas/steps.json": self.steps,
             "meas/result.json": self.result,
-            }
+            })
 
         # Return container object
         config = config or self.config
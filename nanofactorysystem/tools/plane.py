@@ -8,7 +8,7 @@
 # Nanofactory system from Femtika.
 #
 ##########################################################################
-from functools import cached_property
+import math
 
 import numpy as np
 from scidatacontainer import Container
@@ -19,6 +19,39 @@ from ..runtime import mkdir
 from .layer import Layer
 
 
+##########################################################################
+def fit_plane_params(x, y, z):
+
+    """ Return the least squares parameters a, b, c of the plane
+    z = a*x + b*y + c for the given x, y and z values. If z is a 2D
+    array, one plane is fitted to each of its columns and the parameters
+    are returned as columns of a 3xN array. All planes share the same
+    normal equations matrix, which is factorized only once. """
+
+    # Normal equations of the slopes on coordinates centred on their
+    # mean values, which keeps the matrix well conditioned at absolute
+    # stage coordinates
+    xm = x.mean()
+    ym = y.mean()
+    u = x - xm
+    v = y - ym
+    uv_sum = u @ v
+    M = np.array([[u @ u, uv_sum],
+                  [uv_sum, v @ v]])
+
+    # Too few or collinear points: minimum norm solution as returned by
+    # the full least squares solver
+    s = np.linalg.svd(M, compute_uv=False)
+    if s[-1] <= s[0] * np.sqrt(np.finfo(float).eps):
+        A = np.column_stack((x, y, np.ones_like(x)))
+        return np.linalg.lstsq(A, z, rcond=None)[0]
+
+    # Slopes and offset shifted back to the original origin
+    ab = np.linalg.solve(M, np.array([u @ z, v @ z]))
+    c = z.mean(axis=0) - ab[0]*xm - ab[1]*ym
+    return np.concatenate((ab, np.expand_dims(c, 0)))
+
+
 ##########################################################################
 class PlaneFit(object):
 
@@ -29,35 +62,30 @@ class PlaneFit(object):
 
         """ Run the fitting algorithm and store the results. """
 
-        # Least squares plane fitting
-        A = np.array(points, dtype=float)
-        b = np.array(A[:,-1])
-        A[:,-1] = 1.0
+        # Least squares plane fitting by fit_plane_params(). No design
+        # matrix is built, so the given points are never modified.
+        x, y, z = np.asarray(points, dtype=float).T
         if params is None:
-            params = np.linalg.lstsq(A, b, rcond=None)[0]
+            params = fit_plane_params(x, y, z)
 
         self.params = params
 
         # Average z deviation
-        self.dev = np.dot(A, self.params) - b
-        self.avg = np.sqrt(sum(self.dev*self.dev))/len(self.dev)
-
-        # Surface normal vector
-        p0 = self.getvec(0, 0)
-        p1 = self.getvec(1, 0) - p0
-        p2 = self.getvec(0, 1) - p0
-        x, y, z = np.cross(p1, p2)
+        self.dev = x*self.params[0] + y*self.params[1] + self.params[2] - z
+        self.avg = np.linalg.norm(self.dev) / len(self.dev)
+        self.max_dev = float(np.abs(self.dev).max())
 
-        # Length of y projection and length of vector
-        rxy = np.hypot(x, y)
-        #r = np.hypot(rxy, z)
+        # The surface normal vector of the plane z = a*x + b*y + c is
+        # (-a, -b, 1) and its xy projection has the length hypot(a, b)
+        sx, sy = self.params[:2]
+        rxy = math.hypot(sx, sy)
 
         # Plane slope and polar angle
-        self.slope = rxy / z
-        self.theta = np.arctan2(rxy, z) * 180.0 / np.pi
+        self.slope = rxy
+        self.theta = math.degrees(math.atan2(rxy, 1.0))
 
         # Azimuthal angle
-        self.phi = np.arctan2(y, x) * 180.0 / np.pi
+        self.phi = math.degrees(math.atan2(-sy, -sx))
         self.phi = (self.phi % 360) - 180
         # TODO: With modulo slightly different edge cases (-180 vs 180)
         # while self.phi > 180.0:
@@ -65,10 +93,6 @@ class PlaneFit(object):
         # while self.phi <= -180.0:
         #     self.phi += 360.0
 
-    @cached_property
-    def max_dev(self) -> float:
-        return np.max(np.abs(self.dev))
-
     def __str__(self) -> str:
 
         """ Return result string. """
@@ -94,9 +118,9 @@ class PlaneFit(object):
     def getz(self, x: float, y: float) -> float:
 
         """ Return z value of the plane at the given lateral xy
-        position. """
+        position. The coordinates may also be NumPy arrays. """
 
-        return np.dot(self.params, [x, y, 1])
+        return self.params[0]*x + self.params[1]*y + self.params[2]
 
 
     def getvec(self, x: float, y: float) -> np.ndarray:
@@ -125,9 +149,9 @@ class zPlane(object):
     def getz(self, x, y):
 
         """ Return z value of the plane at the given lateral xy
-        position. """
+        position. The coordinates may also be NumPy arrays. """
 
-        return np.dot(self.params, [x, y, 1])
+        return self.params[0]*x + self.params[1]*y + self.params[2]
 
 
 ##########################################################################
@@ -215,15 +239,17 @@ class Plane(Parameter):
         steps = list(self.steps)
         points = [[s["x"], s["y"], s["zLower"], s["zUpper"]] for s in steps]
         points = np.array(points, dtype=float)
-        lower = points[:,(0,1,2)]
-        upper = points[:,(0,1,3)]
+
+        # Fit both planes in a single solve, since they share x and y
+        params = fit_plane_params(points[:,0], points[:,1], points[:,2:])
 
         result = {}
-        for key, points, name in [
-            ("lower", lower, "Lower"),
-            ("upper", upper, "Upper")
+        for key, cols, name, p in [
+            ("lower", (0,1,2), "Lower", params[:,0]),
+            ("upper", (0,1,3), "Upper", params[:,1])
         ]:
-            plane = PlaneFit(points)
+            plane_points = points[:,cols]
+            plane = PlaneFit(plane_points, params=p)
             plane.log_results(self.log.info, name)
             result[key] = {
                 "xSlope": plane.params[0],
@@ -234,7 +260,7 @@ class Plane(Parameter):
                 "gradient": plane.slope,
                 "polarAngle": plane.theta,
                 "azimuthAngle": plane.phi,
-                "points": points.tolist(),
+                "points": plane_points.tolist(),
                 }
 
         self.steps = []
@@ -266,14 +292,15 @@ class Plane(Parameter):
             }
 
         # Container dictionary
-        items = self.system.items() | {
+        items = self.system.items()
+        items.update({
             "content.json": content,
             "meta.json": meta,
             "references.json": refs,
             "data/plane.json": self.parameters(),
             "meas/steps.json": steps,
             "meas/result.json": result,
-            }
+            })
 
         # Return container object
         config = config or self.config
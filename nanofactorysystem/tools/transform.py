@@ -178,6 +178,29 @@ class Transform(object):
         return vs + np.matmul(self.P, v_px)
     
 
+    def object_pos_batch(self, v_px, vs):
+        
+        """ Return an array of object coordinates from the given sequence
+        of camera image coordinates based on the given stage coordinates.
+        The image coordinates are transformed by a single matrix product.
+        """
+        
+        assert len(vs) == 3
+        vs = np.array(vs, dtype=float)
+        assert vs.shape == (3,)
+        
+        v_px = np.array(v_px, dtype=float)
+        if v_px.size == 0:
+            return np.empty((0, 3))
+        v_px = np.atleast_2d(v_px)
+        assert v_px.ndim == 2
+        if v_px.shape[1] == 2:
+            v_px = np.hstack((v_px, np.ones((len(v_px), 1))))
+        assert v_px.shape[1] == 3
+        
+        return vs + np.matmul(v_px, self.P.T)
+    
+
     def camera_pos(self, v_um, vs):
         
         """ Return camera image coordinates from given object coordinates
@@ -200,6 +223,31 @@ class Transform(object):
         return np.matmul(self.Pinv2D, v_um - vs)
 
 
+    def camera_pos_batch(self, v_um, vs):
+        
+        """ Return an array of camera image coordinates from the given
+        sequence of object coordinates based on the given stage coordinates.
+        The object coordinates are transformed by a single matrix product.
+        """
+        
+        if len(vs) > 2:
+            vs = vs[:2]
+        assert len(vs) == 2
+        vs = np.array(vs, dtype=float)
+        assert vs.shape == (2,)
+        
+        v_um = np.array(v_um, dtype=float)
+        if v_um.size == 0:
+            return np.empty((0, 2))
+        v_um = np.atleast_2d(v_um)
+        assert v_um.ndim == 2
+        if v_um.shape[1] == 3:
+            v_um = v_um[:,:2]
+        assert v_um.shape[1] == 2
+        
+        return np.matmul(v_um - vs, self.Pinv2D.T)
+
+
     # def camera_rel(self, v_um):
         
     #     """ Return camera image x,y distances from given relative x,y object